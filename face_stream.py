@@ -1,14 +1,27 @@
 import argparse
+import functools
 import http.server
 import os
+import select
+import socket
 import socketserver
 import threading
 import time
 
 try:
     import cv2
+    import numpy as np
 except ImportError:
     cv2 = None
+    np = None
+
+try:
+    import gi
+
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst
+except (ImportError, ValueError):
+    Gst = None
 
 
 # Default YuNet model path relative to the project root.
@@ -19,19 +32,283 @@ DEFAULT_MODEL = os.path.join(
 )
 
 
+def _int8_model_path(model_path):
+    # Quantized YuNet weights sit next to the FP32 model as "<name>_int8.onnx".
+    root, ext = os.path.splitext(model_path)
+    return f"{root}_int8{ext}"
+
+
+# DNN backends accepted by --backend, mapped to OpenCV ids in _dnn_backend().
+DNN_BACKENDS = ("cpu", "openvino", "cuda")
+
+
+def _probe_dnn_backend(name):
+    # Fail at startup if this OpenCV build lacks the requested DNN backend.
+    if name == "cpu":
+        return
+    available = {tuple(pair) for pair in cv2.dnn.getAvailableBackends()}
+    if _dnn_backend(name) not in available:
+        raise RuntimeError(f"DNN backend {name} not available in this OpenCV build.")
+
+
+def _dnn_backend(name):
+    # Map a backend name to the (backend_id, target_id) pair for OpenCV DNN.
+    if name == "openvino":
+        return cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE, cv2.dnn.DNN_TARGET_CPU
+    if name == "cuda":
+        return cv2.dnn.DNN_BACKEND_CUDA, cv2.dnn.DNN_TARGET_CUDA_FP16
+    return cv2.dnn.DNN_BACKEND_OPENCV, cv2.dnn.DNN_TARGET_CPU
+
+
+class _SharedDetector:
+    """YuNet detector shared by every runner with the same model settings."""
+
+    def __init__(self, detector, input_size):
+        self._detector = detector
+        self._input_size = input_size
+        self._lock = threading.Lock()
+
+    def detect(self, image):
+        # Serialize runners on the shared graph; only reset the input size
+        # (which regenerates YuNet's priors) when it actually changes.
+        height, width = image.shape[:2]
+        with self._lock:
+            if self._input_size != (width, height):
+                self._detector.setInputSize((width, height))
+                self._input_size = (width, height)
+            return self._detector.detect(image)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_detector(model_path, score_threshold, nms_threshold, top_k, backend):
+    # Load and build the YuNet graph once per distinct configuration. The
+    # Python binding has no setPreferableBackend, so the backend goes to create().
+    input_size = (320, 320)
+    backend_id, target_id = _dnn_backend(backend)
+    detector = cv2.FaceDetectorYN.create(
+        model_path,
+        "",
+        input_size,
+        score_threshold,
+        nms_threshold,
+        top_k,
+        backend_id,
+        target_id,
+    )
+    return _SharedDetector(detector, input_size)
+
+
+# Socket send buffer for MJPEG clients, sized for a worst-case JPEG frame.
+STREAM_SNDBUF = 1 << 20
+
+# JPEG codec name that selects the OpenCV (libjpeg-turbo) software encoder.
+OPENCV_JPEG_CODEC = "opencv"
+
+
+# Nanoseconds to wait for a hardware encoder to return one JPEG.
+GST_PULL_TIMEOUT = 1_000_000_000
+
+
+class _JpegEncoder:
+    """Encode BGR frames to JPEG, optionally on a hardware encoder via GStreamer."""
+
+    def __init__(self, codec=OPENCV_JPEG_CODEC):
+        # Any codec other than "opencv" is a GStreamer JPEG encoder element
+        # (for example "v4l2jpegenc" on a Pi or "vaapijpegenc" on Intel). The
+        # pipeline is stateful, so an instance must only be used from one thread.
+        self._codec = codec
+        self._pipeline = None
+        self._src = None
+        self._sink = None
+        self._size = None
+        self._inflight = None
+
+    def encode(self, frame):
+        # Return the encoded JPEG as bytes, or None if encoding failed.
+        if self._codec == OPENCV_JPEG_CODEC:
+            ok, encoded = cv2.imencode(".jpg", frame)
+            return encoded.tobytes() if ok else None
+        height, width = frame.shape[:2]
+        if self._pipeline is None or self._size != (width, height):
+            self._open_pipeline(width, height)
+        # Drop any late sample from an earlier frame so the pull below returns
+        # this frame's JPEG, not a stale one.
+        while self._sink.emit("try-pull-sample", 0) is not None:
+            pass
+        # Wrap the frame memory read-only instead of copying it; keep the array
+        # alive until the next frame or close(), which flushes the pipeline.
+        frame = np.ascontiguousarray(frame)
+        self._inflight = frame
+        buffer = Gst.Buffer.new_wrapped_full(
+            Gst.MemoryFlags.READONLY,
+            memoryview(frame).cast("B"),
+            frame.nbytes,
+            0,
+            None,
+            None,
+        )
+        self._src.emit("push-buffer", buffer)
+        sample = self._sink.emit("try-pull-sample", GST_PULL_TIMEOUT)
+        if sample is None:
+            return None
+        buf = sample.get_buffer()
+        return buf.extract_dup(0, buf.get_size())
+
+    def close(self):
+        # Release the hardware encoder, if one was opened.
+        if self._pipeline is not None:
+            self._pipeline.set_state(Gst.State.NULL)
+            self._pipeline = None
+        self._inflight = None
+
+    def _open_pipeline(self, width, height):
+        # (Re)build appsrc -> encoder -> appsink whenever the frame size changes.
+        self.close()
+        pipeline = Gst.parse_launch(
+            "appsrc name=src is-live=true do-timestamp=true format=time "
+            f"caps=video/x-raw,format=BGR,width={width},height={height},"
+            f"framerate=0/1 ! videoconvert ! {self._codec} "
+            "! appsink name=sink sync=false max-buffers=1 drop=true"
+        )
+        if pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            pipeline.set_state(Gst.State.NULL)
+            raise RuntimeError(f"JPEG encoder {self._codec} failed to start.")
+        self._pipeline = pipeline
+        self._src = pipeline.get_by_name("src")
+        self._sink = pipeline.get_by_name("sink")
+        self._size = (width, height)
+
+
+def _probe_jpeg_codec(codec):
+    # Check a hardware JPEG encoder once at startup so a bad --jpeg-codec
+    # fails clearly instead of on the first streamed frame.
+    if codec == OPENCV_JPEG_CODEC:
+        return
+    if Gst is None:
+        raise RuntimeError(f"JPEG codec {codec} needs GStreamer (PyGObject).")
+    Gst.init(None)
+    if Gst.ElementFactory.find(codec) is None:
+        raise RuntimeError(f"GStreamer JPEG encoder not found: {codec}")
+    encoder = _JpegEncoder(codec)
+    try:
+        encoded = encoder.encode(np.zeros((64, 64, 3), np.uint8))
+    except Exception as exc:
+        raise RuntimeError(f"JPEG codec {codec} unusable: {exc}") from exc
+    finally:
+        encoder.close()
+    if not encoded:
+        raise RuntimeError(f"JPEG codec {codec} produced no output.")
+
+
+class JpegRing:
+    """Lock-free ring of the most recent JPEG packets from a single producer."""
+
+    def __init__(self, size=8):
+        # A power-of-two size lets the slot index be a bit mask of the head.
+        if size <= 0 or size & (size - 1):
+            raise ValueError("JpegRing size must be a power of two.")
+        self._mask = size - 1
+        self._slots = [None] * size
+        # Count of published packets. Only the producer rebinds it, and an int
+        # rebind is atomic under the GIL, so readers load it without a lock.
+        self._head = 0
+        # Connected readers, so the producer can idle when nobody is watching.
+        self._readers = 0
+        self._readers_lock = threading.Lock()
+
+    @property
+    def readers(self):
+        return self._readers
+
+    def attach(self):
+        # Register a reader and return the current head, so it can start after
+        # packets published before it connected.
+        with self._readers_lock:
+            self._readers += 1
+        return self._head
+
+    def detach(self):
+        with self._readers_lock:
+            self._readers -= 1
+
+    def push(self, data):
+        # Store the packet as immutable bytes, then advance head to publish it.
+        # Readers keep their own reference, so a slow send never sees a slot
+        # being reused underneath it.
+        head = self._head
+        self._slots[head & self._mask] = bytes(data)
+        self._head = head + 1
+
+    def latest(self):
+        # Return (sequence, packet) of the newest packet, or (0, None) if empty.
+        head = self._head
+        if head == 0:
+            return 0, None
+        return head, self._slots[(head - 1) & self._mask]
+
+
+def _sendmsg_all(sock, buffers):
+    # Send all buffers as one vectored write, retrying after partial sends.
+    pending = [memoryview(buf) for buf in buffers if len(buf)]
+    while pending:
+        sent = sock.sendmsg(pending)
+        while sent:
+            size = len(pending[0])
+            if sent < size:
+                pending[0] = pending[0][sent:]
+                break
+            sent -= size
+            pending.pop(0)
+
+
 # Threaded HTTP server to serve a continuous MJPEG stream.
 class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
     daemon_threads = True
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set on shutdown so streaming handlers leave their loops.
+        self.closing = threading.Event()
+
+    def shutdown(self):
+        self.closing.set()
+        super().shutdown()
+
 
-def _start_mjpeg_server(host, port, get_frame, fps):
+def _start_mjpeg_server(host, port, ring, fps, raw_ring=None):
     # MJPEG uses a boundary string to delimit individual JPEG frames.
     boundary = "frame"
+    # Annotated frames on / and /stream; camera JPEGs on /raw when enabled.
+    rings = {"/": ring, "/stream": ring}
+    if raw_ring is not None:
+        rings["/raw"] = raw_ring
 
     class MJPEGHandler(http.server.BaseHTTPRequestHandler):
+        # Set TCP_NODELAY so Nagle never holds back the tail of a frame.
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            # Let a whole frame sit in the kernel buffer without blocking.
+            self.connection.setsockopt(
+                socket.SOL_SOCKET, socket.SO_SNDBUF, STREAM_SNDBUF
+            )
+
+        def _peer_closed(self, timeout):
+            # Wait up to timeout for the client to hang up. MJPEG viewers send
+            # nothing after the request, so a readable socket means EOF/reset.
+            readable, _, _ = select.select([self.connection], [], [], timeout)
+            if not readable:
+                return False
+            try:
+                return not self.connection.recv(4096)
+            except OSError:
+                return True
+
         def do_GET(self):
-            # Only serve the root or /stream endpoints.
-            if self.path not in ("/", "/stream"):
+            # Only serve the configured stream endpoints.
+            ring = rings.get(self.path)
+            if ring is None:
                 self.send_error(404)
                 return
             self.send_response(200)
@@ -45,30 +322,35 @@ def _start_mjpeg_server(host, port, get_frame, fps):
 
             # Use a fixed delay to pace the stream if fps is set.
             delay = 1.0 / fps if fps > 0 else 0.0
-            while True:
-                # Pull the latest frame snapshot from the producer thread.
-                frame = get_frame()
-                if frame is None:
-                    time.sleep(0.05)
-                    continue
-                # Encode the frame as JPEG for MJPEG streaming.
-                ok, encoded = cv2.imencode(".jpg", frame)
-                if not ok:
-                    continue
-                try:
-                    # Write the multipart MJPEG frame with headers.
-                    self.wfile.write(f"--{boundary}\r\n".encode("ascii"))
-                    self.wfile.write(b"Content-Type: image/jpeg\r\n")
-                    self.wfile.write(
-                        f"Content-Length: {len(encoded)}\r\n\r\n".encode("ascii")
-                    )
-                    self.wfile.write(encoded.tobytes())
-                    self.wfile.write(b"\r\n")
-                    self.wfile.flush()
-                except (BrokenPipeError, ConnectionResetError):
-                    break
-                if delay:
-                    time.sleep(delay)
+            # Sequence number of the last packet sent to this client; starting
+            # at the head skips packets left over from earlier viewers.
+            tail = ring.attach()
+            try:
+                while not self.server.closing.is_set():
+                    # Pull the newest encoded packet from the producer.
+                    seq, encoded = ring.latest()
+                    if encoded is None or seq == tail:
+                        # Nothing new to send; notice clients that left while
+                        # the producer is stalled.
+                        if self._peer_closed(0.01):
+                            break
+                        continue
+                    tail = seq
+                    try:
+                        # Write the multipart headers, JPEG, and trailer in
+                        # a single sendmsg() call.
+                        header = (
+                            f"--{boundary}\r\n"
+                            "Content-Type: image/jpeg\r\n"
+                            f"Content-Length: {len(encoded)}\r\n\r\n"
+                        ).encode("ascii")
+                        _sendmsg_all(self.connection, (header, encoded, b"\r\n"))
+                    except (BrokenPipeError, ConnectionResetError):
+                        break
+                    if delay:
+                        time.sleep(delay)
+            finally:
+                ring.detach()
 
         def log_message(self, format, *args):
             # Suppress default HTTP request logging.
@@ -80,17 +362,41 @@ def _start_mjpeg_server(host, port, get_frame, fps):
     return server
 
 
+def _letterbox(frame, size):
+    # Shrink the frame to fit a size x size square, padding bottom/right so
+    # detections map back by scale alone. Returns (padded, scale).
+    height, width = frame.shape[:2]
+    scale = min(size / width, size / height)
+    new_width = max(1, int(width * scale))
+    new_height = max(1, int(height * scale))
+    resized = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    padded = cv2.copyMakeBorder(
+        resized,
+        0,
+        size - new_height,
+        0,
+        size - new_width,
+        cv2.BORDER_CONSTANT,
+        value=(0, 0, 0),
+    )
+    return padded, scale
+
+
 def _draw_faces(frame, faces, draw_landmarks):
     # Draw bounding boxes, confidence score, and optional landmarks.
-    for face in faces:
-        x, y, w, h = face[:4]
-        score = face[4]
-        x1, y1 = int(x), int(y)
-        x2, y2 = int(x + w), int(y + h)
+    # YuNet rows are [x, y, w, h, 5 landmark (x, y) pairs, score].
+    boxes = faces[:, :4].astype(np.int32)
+    boxes[:, 2:] += boxes[:, :2]
+    scores = faces[:, 14]
+    landmarks = None
+    if draw_landmarks and faces.shape[1] >= 15:
+        landmarks = faces[:, 4:14].astype(np.int32).reshape(-1, 5, 2)
+    for i in range(len(boxes)):
+        x1, y1, x2, y2 = boxes[i].tolist()
         cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
         cv2.putText(
             frame,
-            f"{score:.2f}",
+            f"{scores[i]:.2f}",
             (x1, max(y1 - 6, 0)),
             cv2.FONT_HERSHEY_SIMPLEX,
             0.5,
@@ -98,10 +404,8 @@ def _draw_faces(frame, faces, draw_landmarks):
             1,
             cv2.LINE_AA,
         )
-        if draw_landmarks and len(face) >= 15:
-            for i in range(5):
-                lx = int(face[5 + i * 2])
-                ly = int(face[5 + i * 2 + 1])
+        if landmarks is not None:
+            for lx, ly in landmarks[i].tolist():
                 cv2.circle(frame, (lx, ly), 2, (0, 255, 255), -1)
 
 
@@ -120,7 +424,20 @@ class FaceStreamRunner:
         stream_port=8080,
         stream_fps=10.0,
         display=False,
+        jpeg_codec=OPENCV_JPEG_CODEC,
+        backend="cpu",
+        detect_size=320,
+        quantize=False,
+        raw_stream=False,
     ):
+        # Int8 YuNet is only faster on OpenVINO; the default DNN backend has no
+        # optimized int8 kernels, so keep FP32 everywhere else.
+        if quantize:
+            if backend == "openvino":
+                model_path = _int8_model_path(model_path)
+            else:
+                print("Int8 YuNet requires the openvino backend; using FP32.")
+
         # Capture configuration and model parameters.
         self._model_path = model_path
         self._device = device
@@ -134,13 +451,39 @@ class FaceStreamRunner:
         self._stream_port = stream_port
         self._stream_fps = stream_fps
         self._display = display
+        self._jpeg_codec = jpeg_codec
+        self._backend = backend
+        # Square detector input size; 0 runs detection at full frame size.
+        self._detect_size = detect_size
+        # Request MJPEG from the camera and pass it through on /raw.
+        self._raw_stream = raw_stream
 
         # Runtime state (threading, frame cache, and HTTP server).
         self._thread = None
         self._stop_event = threading.Event()
-        self._frame_lock = threading.Lock()
-        self._latest_frame = None
         self._server = None
+        # Frame handoff to the encoder: it raises _frame_wanted when idle and
+        # the detector copies its next frame into the single slot. The slot is
+        # only written while the encoder waits, so it never changes mid-encode
+        # and frames are copied at stream fps, not detection fps.
+        self._frame_cond = threading.Condition()
+        self._frame_wanted = False
+        self._frame_ready = False
+        self._frame_slot = None
+        # Encoder thread output shared with every HTTP client.
+        self._jpeg_ring = JpegRing()
+        self._encode_thread = None
+        # One-deep mailbox from the capture thread; a newer frame replaces an
+        # unclaimed older one, so detection always works on the latest frame.
+        # Frames live in two reused capture buffers: _raw is the index of the
+        # unclaimed one and _raw_held the one the detector is working on.
+        self._cap_thread = None
+        self._raw_cond = threading.Condition()
+        self._cap_bufs = None
+        self._raw = None
+        self._raw_held = None
+        # Undecoded camera JPEGs for /raw clients (only with raw_stream).
+        self._raw_ring = JpegRing()
 
     def start(self):
         # Start the capture + detection thread if it is not running yet.
@@ -150,6 +493,8 @@ class FaceStreamRunner:
             raise RuntimeError("OpenCV not installed.")
         if not os.path.exists(self._model_path):
             raise FileNotFoundError(f"YuNet model not found: {self._model_path}")
+        _probe_dnn_backend(self._backend)
+        _probe_jpeg_codec(self._jpeg_codec)
         self._stop_event.clear()
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
@@ -162,61 +507,195 @@ class FaceStreamRunner:
         self._thread.join(timeout=5)
         self._thread = None
 
-    def _get_latest_frame(self):
-        # Return a copy so the HTTP server never mutates the shared frame.
-        with self._frame_lock:
-            return None if self._latest_frame is None else self._latest_frame.copy()
+    def _take_frame(self, timeout=0.1):
+        # Ask the detector for its next frame and wait for the handoff. The
+        # slot stays untouched until the next call asks for another frame.
+        with self._frame_cond:
+            if not self._frame_ready:
+                self._frame_wanted = True
+                self._frame_cond.wait(timeout)
+            if not self._frame_ready:
+                return None
+            self._frame_ready = False
+            return self._frame_slot
+
+    def _publish_frame(self, frame):
+        # Copy the frame into the handoff slot and wake the waiting encoder.
+        with self._frame_cond:
+            if self._frame_slot is None or self._frame_slot.shape != frame.shape:
+                self._frame_slot = np.empty_like(frame)
+            np.copyto(self._frame_slot, frame)
+            self._frame_wanted = False
+            self._frame_ready = True
+            self._frame_cond.notify()
+
+    def _encode_loop(self):
+        # Encode fresh detector frames into the JPEG ring at stream fps. Only
+        # the rest of the interval is waited out after encoding, so the period
+        # is max(encode time, 1 / fps) rather than their sum.
+        encoder = _JpegEncoder(self._jpeg_codec)
+        delay = 1.0 / self._stream_fps if self._stream_fps > 0 else 0.0
+        last_error = None
+        try:
+            while not self._stop_event.is_set():
+                if not self._jpeg_ring.readers:
+                    # No client is connected; withdraw any request so the
+                    # detector copies nothing and no stale frame is kept.
+                    with self._frame_cond:
+                        self._frame_wanted = False
+                        self._frame_ready = False
+                    time.sleep(0.05)
+                    continue
+                started = time.monotonic()
+                # Every handed-off frame is new, so nothing is encoded twice;
+                # clients keep serving the cached packet in between.
+                frame = self._take_frame()
+                if frame is None:
+                    continue
+                try:
+                    encoded = encoder.encode(frame)
+                except Exception as exc:
+                    # Skip the frame rather than end the stream; report each
+                    # distinct failure once.
+                    encoded = None
+                    if str(exc) != last_error:
+                        last_error = str(exc)
+                        print(f"JPEG encode failed: {exc}")
+                if encoded is not None:
+                    self._jpeg_ring.push(encoded)
+                if delay:
+                    elapsed = time.monotonic() - started
+                    self._stop_event.wait(max(0.0, delay - elapsed))
+        finally:
+            encoder.close()
+
+    def _enable_raw_capture(self, cap):
+        # Ask for MJPEG without BGR conversion; return False if unsupported.
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+        if int(cap.get(cv2.CAP_PROP_FOURCC)) != cv2.VideoWriter_fourcc(*"MJPG"):
+            print("Camera does not deliver MJPEG; raw stream disabled.")
+            return False
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        return True
+
+    def _retrieve_frame(self, cap, dst=None):
+        # Decode the grabbed frame to BGR, into dst when possible. In raw mode
+        # also publish the camera's JPEG before decoding it.
+        if not self._raw_stream:
+            return cap.retrieve(dst)
+        ret, data = cap.retrieve()
+        if not ret:
+            return False, None
+        data = data.reshape(-1)
+        if self._raw_ring.readers:
+            self._raw_ring.push(data)
+        frame = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        return frame is not None, frame
+
+    def _capture_loop(self, cap):
+        # Grab frames as fast as the camera delivers them, keeping the newest.
+        index = 0
+        while not self._stop_event.is_set():
+            if not cap.grab():
+                time.sleep(0.05)
+                continue
+            with self._raw_cond:
+                # Never overwrite the detector's buffer; an unclaimed frame in
+                # the other buffer is simply replaced.
+                if index == self._raw_held:
+                    index ^= 1
+                if self._raw == index:
+                    self._raw = None
+            ret, frame = self._retrieve_frame(cap, self._cap_bufs[index])
+            if not ret:
+                continue
+            # OpenCV allocates a new array if the frame size changed.
+            self._cap_bufs[index] = frame
+            with self._raw_cond:
+                self._raw = index
+                self._raw_cond.notify()
+            index ^= 1
+
+    def _take_raw_frame(self, timeout=0.1):
+        # Claim the newest captured frame, waiting briefly if none is ready.
+        with self._raw_cond:
+            if self._raw is None:
+                self._raw_cond.wait(timeout)
+            index, self._raw = self._raw, None
+            self._raw_held = index
+        return None if index is None else self._cap_bufs[index]
 
     def _run(self):
         # Convert numeric device strings (e.g., "0") into camera indexes.
         device = int(self._device) if str(self._device).isdigit() else self._device
         cap = cv2.VideoCapture(device)
+        # Keep the driver queue short so stale frames do not pile up.
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        # Pick the pixel format before the resolution: V4L2 may reset the
+        # negotiated size when the FOURCC changes.
+        if self._raw_stream and not self._enable_raw_capture(cap):
+            self._raw_stream = False
         if self._width > 0 and self._height > 0:
             cap.set(cv2.CAP_PROP_FRAME_WIDTH, self._width)
             cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self._height)
 
         # Grab one frame to validate the capture and configure the detector.
-        ret, frame = cap.read()
+        ret, frame = self._retrieve_frame(cap) if cap.grab() else (False, None)
         if not ret:
             cap.release()
             return
-
-        height, width = frame.shape[:2]
-        # Create the YuNet detector with the initial input size.
-        detector = cv2.FaceDetectorYN.create(
-            self._model_path,
-            "",
-            (width, height),
-            self._score_threshold,
-            self._nms_threshold,
-            self._top_k,
-        )
+        # Ping-pong capture buffers reused by every cap.retrieve().
+        self._cap_bufs = [np.empty_like(frame), np.empty_like(frame)]
 
         window_name = "YuNet Face Detection"
-        # Start the HTTP MJPEG server in a background thread.
-        self._server = _start_mjpeg_server(
-            self._stream_host,
-            self._stream_port,
-            self._get_latest_frame,
-            self._stream_fps,
-        )
-        print(f"Streaming on http://{self._stream_host}:{self._stream_port}/")
-
         try:
+            # Reuse the cached YuNet detector for this model configuration.
+            detector = _get_detector(
+                self._model_path,
+                self._score_threshold,
+                self._nms_threshold,
+                self._top_k,
+                self._backend,
+            )
+
+            # Start the JPEG encoder and the HTTP MJPEG server in the background.
+            self._encode_thread = threading.Thread(
+                target=self._encode_loop, daemon=True
+            )
+            self._encode_thread.start()
+            self._server = _start_mjpeg_server(
+                self._stream_host,
+                self._stream_port,
+                self._jpeg_ring,
+                self._stream_fps,
+                self._raw_ring if self._raw_stream else None,
+            )
+            print(f"Streaming on http://{self._stream_host}:{self._stream_port}/")
+
+            # Capture on its own thread; this thread only runs detection.
+            self._cap_thread = threading.Thread(
+                target=self._capture_loop, args=(cap,), daemon=True
+            )
+            self._cap_thread.start()
+
             while not self._stop_event.is_set():
-                ret, frame = cap.read()
-                if not ret:
-                    time.sleep(0.05)
+                frame = self._take_raw_frame()
+                if frame is None:
                     continue
-                # Update the detector input size for any resolution changes.
-                height, width = frame.shape[:2]
-                detector.setInputSize((width, height))
-                _, faces = detector.detect(frame)
+                if self._detect_size > 0:
+                    # Detect on a small letterboxed copy, then scale back up.
+                    small, scale = _letterbox(frame, self._detect_size)
+                    _, faces = detector.detect(small)
+                    if faces is not None:
+                        faces[:, :14] /= scale
+                else:
+                    # The detector follows any resolution change by itself.
+                    _, faces = detector.detect(frame)
                 if faces is not None and len(faces):
                     _draw_faces(frame, faces, self._draw_landmarks)
-                # Update the shared frame for the HTTP server.
-                with self._frame_lock:
-                    self._latest_frame = frame
+                # Copy a frame out only when the encoder has asked for one.
+                if self._frame_wanted:
+                    self._publish_frame(frame)
                 if self._display:
                     # Optional local preview window with exit on Esc or "q".
                     cv2.imshow(window_name, frame)
@@ -224,8 +703,17 @@ class FaceStreamRunner:
                     if key in (27, ord("q")):
                         break
         finally:
-            # Always release the camera and shut down the HTTP server.
+            # Always release the camera and shut down the worker threads.
+            self._stop_event.set()
+            if self._cap_thread is not None:
+                self._cap_thread.join(timeout=5)
+                self._cap_thread = None
+            self._raw = None
+            self._raw_held = None
             cap.release()
+            if self._encode_thread is not None:
+                self._encode_thread.join(timeout=5)
+                self._encode_thread = None
             if self._server is not None:
                 self._server.shutdown()
                 self._server = None
@@ -250,6 +738,23 @@ def main():
     parser.add_argument("--stream-port", type=int, default=8080)
     parser.add_argument("--stream-fps", type=float, default=10.0)
     parser.add_argument("--display", action="store_true")
+    parser.add_argument(
+        "--jpeg-codec",
+        default=OPENCV_JPEG_CODEC,
+        help="JPEG encoder: 'opencv' or a GStreamer element such as 'v4l2jpegenc'.",
+    )
+    parser.add_argument("--backend", choices=DNN_BACKENDS, default="cpu")
+    parser.add_argument("--detect-size", type=int, default=320)
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Use the int8 YuNet model (only with --backend openvino).",
+    )
+    parser.add_argument(
+        "--raw-stream",
+        action="store_true",
+        help="Capture MJPEG and serve the camera's own JPEGs on /raw.",
+    )
     args = parser.parse_args()
 
     # Disable display output when running without a GUI session.
@@ -271,6 +776,11 @@ def main():
         stream_port=args.stream_port,
         stream_fps=args.stream_fps,
         display=args.display,
+        jpeg_codec=args.jpeg_codec,
+        backend=args.backend,
+        detect_size=args.detect_size,
+        quantize=args.quantize,
+        raw_stream=args.raw_stream,
     )
     try:
         runner.start()
@@ -0,0 +1,56 @@
+import os
+import select
+import struct
+import time
+
+# Linux joystick event: struct js_event { u32 time; s16 value; u8 type; u8 number; }
+JS_EVENT = struct.Struct("=IhBB")
+JS_EVENT_BUTTON = 0x01
+JS_EVENT_AXIS = 0x02
+JS_EVENT_INIT = 0x80  # Set on the synthetic events that report initial state.
+READ_BATCH = 64  # Maximum events pulled per read() call.
+
+
+class JsReader:
+    """Read joystick events in batches and dispatch them by (type, number)."""
+
+    def __init__(self, interface, handlers):
+        # Handlers map (event type, axis/button number) to a callable(value).
+        self._interface = interface
+        self._handlers = handlers
+
+    def listen(self, timeout=30):
+        # Wait for the device node to appear, then dispatch until it goes away.
+        deadline = time.monotonic() + timeout
+        print(f"Waiting for interface: {self._interface} to become available . . .")
+        while not os.path.exists(self._interface):
+            if time.monotonic() >= deadline:
+                print(f"Timeout({timeout} sec). Interface not available.")
+                raise SystemExit(1)
+            time.sleep(1)
+        print(f"Successfully bound to: {self._interface}.")
+        fd = os.open(self._interface, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            self._read_loop(fd)
+        finally:
+            os.close(fd)
+
+    def _read_loop(self, fd):
+        handlers = self._handlers
+        read_size = JS_EVENT.size * READ_BATCH
+        while True:
+            select.select([fd], [], [])
+            try:
+                buf = os.read(fd, read_size)
+            except BlockingIOError:
+                continue
+            except OSError:
+                print("Interface lost. Device disconnected?")
+                return
+            if not buf:
+                return
+            # The kernel only returns whole events, so the batch unpacks cleanly.
+            for _, value, event_type, number in JS_EVENT.iter_unpack(buf):
+                handler = handlers.get((event_type & ~JS_EVENT_INIT, number))
+                if handler is not None:
+                    handler(value)
@@ -4,7 +4,12 @@ import argparse
 import HiwonderSDK.ros_robot_controller_sdk as rrc
 
 # Local modules for face streaming and mecanum control.
-from face_stream import DEFAULT_MODEL, FaceStreamRunner
+from face_stream import (
+    DEFAULT_MODEL,
+    DNN_BACKENDS,
+    OPENCV_JPEG_CODEC,
+    FaceStreamRunner,
+)
 from wheel_control import MecanumPS4Controller
 
 
@@ -37,6 +42,23 @@ def main():
     parser.add_argument("--face-stream-host", default="0.0.0.0")
     parser.add_argument("--face-stream-port", type=int, default=8080)
     parser.add_argument("--face-stream-fps", type=float, default=10.0)
+    parser.add_argument(
+        "--face-jpeg-codec",
+        default=OPENCV_JPEG_CODEC,
+        help="JPEG encoder: 'opencv' or a GStreamer element such as 'v4l2jpegenc'.",
+    )
+    parser.add_argument("--face-backend", choices=DNN_BACKENDS, default="cpu")
+    parser.add_argument("--face-detect-size", type=int, default=320)
+    parser.add_argument(
+        "--face-quantize",
+        action="store_true",
+        help="Use the int8 YuNet model (only with --face-backend openvino).",
+    )
+    parser.add_argument(
+        "--face-raw-stream",
+        action="store_true",
+        help="Capture MJPEG and serve the camera's own JPEGs on /raw.",
+    )
     args = parser.parse_args()
 
     # Initialize the motor controller board and PS4 controller listener.
@@ -61,6 +83,11 @@ def main():
             stream_host=args.face_stream_host,
             stream_port=args.face_stream_port,
             stream_fps=args.face_stream_fps,
+            jpeg_codec=args.face_jpeg_codec,
+            backend=args.face_backend,
+            detect_size=args.face_detect_size,
+            quantize=args.face_quantize,
+            raw_stream=args.face_raw_stream,
         )
         try:
             face_runner.start()
@@ -1,16 +1,28 @@
-import logging
+import collections
 import os
+import struct
+import threading
+import time
 
-from pyPS4Controller.controller import Controller
-
+from js_reader import JS_EVENT_AXIS, JS_EVENT_BUTTON, JsReader
 from quit_control import QuitControl
 
-MAX_JOY = 32767  # Raw joystick range from pyPS4Controller.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+MAX_JOY = 32767  # Raw joystick axis range from the Linux joystick device.
 MAX_DUTY = 70  # Motor duty range for the controller board.
 DEADZONE = 0.3  # Ignore small stick movements near center.
 MIN_INPUT_CHANGE = 0.1  # Debounce tiny changes after normalization.
+LUT_STEPS = 21  # Duty lookup levels per axis over [-1, 1] (0.1 apart).
 
-LOG_FILENAME = "wheel_speed_normalized.log"
+LOG_FILENAME = "wheel_speed_normalized.bin"
+# Telemetry record: wall time, normalized FL/FR/RL/RR, duty FL/FR/RL/RR.
+LOG_RECORD = struct.Struct("<dffffbbbb")
+LOG_QUEUE_LEN = 8192  # Records kept in memory; the oldest drop when full.
+LOG_FLUSH_INTERVAL = 0.5  # Seconds between background log flushes.
 
 MOTOR_PORTS = {  # Hardware port mapping for each wheel.
     "front_right": 1,
@@ -19,6 +31,17 @@ MOTOR_PORTS = {  # Hardware port mapping for each wheel.
     "rear_left": 2,
 }
 
+# Joystick axis/button numbers for the PS4 controller. L2/R2 axes differ
+# between the kernel hid driver and ds4drv.
+LEFT_STICK_X_AXIS = 0
+LEFT_STICK_Y_AXIS = 1
+TRIGGER_AXES = {  # (L2, R2) axis numbers keyed by "connected via ds4drv".
+    False: (2, 5),
+    True: (3, 4),
+}
+SHARE_BUTTON = 8
+OPTIONS_BUTTON = 9
+
 MOTOR_SIGNS = {  # Flip sign to correct wheel direction.
     "front_left": -1,
     "front_right": 1,
@@ -27,9 +50,92 @@ MOTOR_SIGNS = {  # Flip sign to correct wheel direction.
 }
 
 
-def clamp(value, lo, hi):
-    # Keep values inside a predictable range.
-    return max(lo, min(hi, value))
+def _jit(signature):
+    # Compile with Numba when it is installed; otherwise run as plain Python.
+    if njit is None:
+        return lambda func: func
+    return njit(signature, cache=True, fastmath=True)
+
+
+@_jit("UniTuple(f8, 4)(f8, f8, f8, b1, b1)")
+def _mix_mecanum(x, y, r, l2_pressed, r2_pressed):
+    # Return normalized (front_left, front_right, rear_left, rear_right).
+    if l2_pressed and r2_pressed:
+        # Hard stop when both triggers are pressed.
+        return 0.0, 0.0, 0.0, 0.0
+    # Standard mecanum mixing for strafe (x), forward (y), and rotate (r).
+    front_left = y + x + r
+    front_right = y - x - r
+    rear_left = y - x + r
+    rear_right = y + x - r
+
+    # Normalize so the max magnitude is 1.0 to preserve direction.
+    max_mag = max(
+        1.0,
+        abs(front_left),
+        abs(front_right),
+        abs(rear_left),
+        abs(rear_right),
+    )
+    return (
+        front_left / max_mag,
+        front_right / max_mag,
+        rear_left / max_mag,
+        rear_right / max_mag,
+    )
+
+
+@_jit("UniTuple(f8, 4)(i8, i8, i8, i8)")
+def normalize_stick_trigger(lx, ly, l2, r2):
+    # Map raw left stick values to [-1, 1] with a deadzone and raw triggers to
+    # [0, 1], ignoring negative trigger input. Returns (x, y, l2, r2).
+    x = 0.0
+    if abs(lx) >= DEADZONE * MAX_JOY:
+        x = max(-1.0, min(1.0, lx / MAX_JOY))
+    y = 0.0
+    if abs(ly) >= DEADZONE * MAX_JOY:
+        y = max(-1.0, min(1.0, ly / MAX_JOY))
+    left = 0.0
+    if l2 > 0:
+        left = min(1.0, l2 / MAX_JOY)
+    right = 0.0
+    if r2 > 0:
+        right = min(1.0, r2 / MAX_JOY)
+    return x, y, left, right
+
+
+def _pack_duties(duties):
+    # Pack four signed 8-bit duties into one int for cheap change detection.
+    front_left, front_right, rear_left, rear_right = duties
+    return (
+        (front_left & 0xFF)
+        | ((front_right & 0xFF) << 8)
+        | ((rear_left & 0xFF) << 16)
+        | ((rear_right & 0xFF) << 24)
+    )
+
+
+def _build_duty_lut():
+    # Precompute (normalized wheels, signed duties, packed duties) for every
+    # quantized input, indexed by (iy * LUT_STEPS + ix) * LUT_STEPS + ir.
+    half = (LUT_STEPS - 1) / 2
+    levels = [i / half - 1.0 for i in range(LUT_STEPS)]
+    signs = (
+        MOTOR_SIGNS["front_left"],
+        MOTOR_SIGNS["front_right"],
+        MOTOR_SIGNS["rear_left"],
+        MOTOR_SIGNS["rear_right"],
+    )
+    lut = []
+    for y in levels:
+        for x in levels:
+            for r in levels:
+                norms = _mix_mecanum(x, y, r, False, False)
+                duties = tuple(
+                    int(norm * MAX_DUTY * sign) for norm, sign in zip(norms, signs)
+                )
+                lut.append((norms, duties, _pack_duties(duties)))
+    return lut
 
 
 class MotorControl:
@@ -45,28 +151,34 @@ class MotorControl:
         self._r2 = 0
         # Cached normalized values to reduce jitter.
         self._last_norm = (0.0, 0.0, 0.0)
-        self._last_duties = None
-        self._logger = self._init_logger()
-
-    def _init_logger(self):
-        # Create a single file-backed logger for wheel speed telemetry.
-        log_path = os.path.join(os.path.dirname(__file__), LOG_FILENAME)
-        logger = logging.getLogger("wheel_speed")
-        if not logger.handlers:
-            logger.setLevel(logging.INFO)
-            handler = logging.FileHandler(log_path)
-            formatter = logging.Formatter(
-                "%(asctime)s %(message)s", "%Y-%m-%d %H:%M:%S"
-            )
-            handler.setFormatter(formatter)
-            logger.addHandler(handler)
-        return logger
-
-    def _normalize(self, value):
-        # Map raw stick values to [-1, 1] with a deadzone.
-        if abs(value) < DEADZONE * MAX_JOY:
-            return 0.0
-        return clamp(value / MAX_JOY, -1.0, 1.0)
+        self._last_packed = None
+        # Telemetry records are queued on the control path and written to
+        # disk by a background thread.
+        self._log_path = os.path.join(os.path.dirname(__file__), LOG_FILENAME)
+        self._log_q = collections.deque(maxlen=LOG_QUEUE_LEN)
+        self._log_lock = threading.Lock()
+        threading.Thread(target=self._log_loop, daemon=True).start()
+        # Mecanum mix + duty conversion for every quantized (y, x, r) input.
+        self._lut = _build_duty_lut()
+
+    def _log_loop(self):
+        # Periodically flush queued telemetry off the joystick event thread.
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            self._flush_log()
+
+    def _flush_log(self):
+        # Drain queued records and append them to the binary log in one write.
+        with self._log_lock:
+            records = []
+            while True:
+                try:
+                    records.append(self._log_q.popleft())
+                except IndexError:
+                    break
+            if records:
+                with open(self._log_path, "ab") as log_file:
+                    log_file.write(b"".join(records))
 
     def set_stick(self, x=None, y=None):
         # Update cached stick values then recompute motor duties.
@@ -84,19 +196,11 @@ class MotorControl:
             self._r2 = r2
         self._update()
 
-    def _normalize_trigger(self, value):
-        # Ignore negative trigger input; map positive values to [0, 1].
-        if value <= 0:
-            return 0.0
-        return clamp(value / MAX_JOY, 0.0, 1.0)
-
     def _update(self):
         # Convert raw inputs into normalized strafe/forward/rotation intent.
         # Left stick only: strafe (x) and forward (y).
-        x = self._normalize(self._lx)
-        y = -self._normalize(self._ly)  # stick up -> forward
-        l2 = self._normalize_trigger(self._l2)
-        r2 = self._normalize_trigger(self._r2)
+        x, y, l2, r2 = normalize_stick_trigger(self._lx, self._ly, self._l2, self._r2)
+        y = -y  # stick up -> forward
         r = r2 - l2
 
         # Ignore small post-deadzone changes to reduce jitter.
@@ -110,65 +214,42 @@ class MotorControl:
 
         if l2 > 0.0 and r2 > 0.0:
             # Hard stop when both triggers are pressed.
-            front_left = 0.0
-            front_right = 0.0
-            rear_left = 0.0
-            rear_right = 0.0
+            norms, wheel_duties, packed = (0.0, 0.0, 0.0, 0.0), (0, 0, 0, 0), 0
         else:
-            # Standard mecanum mixing for strafe (x), forward (y), and rotate (r).
-            front_left = y + x + r
-            front_right = y - x - r
-            rear_left = y - x + r
-            rear_right = y + x - r
-
-        # Normalize so the max magnitude is 1.0 to preserve direction.
-        max_mag = max(
-            1.0,
-            abs(front_left),
-            abs(front_right),
-            abs(rear_left),
-            abs(rear_right),
-        )
-        front_left /= max_mag
-        front_right /= max_mag
-        rear_left /= max_mag
-        rear_right /= max_mag
+            # Round each axis to the nearest LUT level and look up the duties.
+            half = (LUT_STEPS - 1) / 2
+            ix = int((x + 1.0) * half + 0.5)
+            iy = int((y + 1.0) * half + 0.5)
+            ir = int((r + 1.0) * half + 0.5)
+            norms, wheel_duties, packed = self._lut[
+                (iy * LUT_STEPS + ix) * LUT_STEPS + ir
+            ]
 
-        # Convert normalized wheel values into motor duty commands.
-        duties = [
-            [
-                MOTOR_PORTS["front_left"],
-                int(front_left * MAX_DUTY * MOTOR_SIGNS["front_left"]),
-            ],
-            [
-                MOTOR_PORTS["front_right"],
-                int(front_right * MAX_DUTY * MOTOR_SIGNS["front_right"]),
-            ],
-            [
-                MOTOR_PORTS["rear_left"],
-                int(rear_left * MAX_DUTY * MOTOR_SIGNS["rear_left"]),
-            ],
-            [
-                MOTOR_PORTS["rear_right"],
-                int(rear_right * MAX_DUTY * MOTOR_SIGNS["rear_right"]),
-            ],
-        ]
-
-        if duties != self._last_duties:
-            self._logger.info(
-                "norm FL=%.3f FR=%.3f RL=%.3f RR=%.3f duty FL=%d FR=%d RL=%d RR=%d",
+        # Only send updates when something changed.
+        if packed == self._last_packed:
+            return
+        self._last_packed = packed
+
+        front_left, front_right, rear_left, rear_right = norms
+        self._log_q.append(
+            LOG_RECORD.pack(
+                time.time(),
                 front_left,
                 front_right,
                 rear_left,
                 rear_right,
-                duties[0][1],
-                duties[1][1],
-                duties[2][1],
-                duties[3][1],
+                *wheel_duties,
             )
-            # Only send updates when something changed.
-            self._board.set_motor_duty(duties)
-            self._last_duties = duties
+        )
+        # Pair each precomputed duty with its motor port.
+        self._board.set_motor_duty(
+            [
+                [MOTOR_PORTS["front_left"], wheel_duties[0]],
+                [MOTOR_PORTS["front_right"], wheel_duties[1]],
+                [MOTOR_PORTS["rear_left"], wheel_duties[2]],
+                [MOTOR_PORTS["rear_right"], wheel_duties[3]],
+            ]
+        )
 
     def stop(self):
         # Hard stop all motors.
@@ -180,69 +261,49 @@ class MotorControl:
                 [MOTOR_PORTS["rear_right"], 0],
             ]
         )
-        self._last_duties = None
+        self._last_packed = None
+        # Persist pending telemetry, since stop() also runs on exit.
+        self._flush_log()
 
 
-class MecanumPS4Controller(Controller, QuitControl):
-    def __init__(self, board, **kwargs):
-        # Wire the PS4 controller to motor control, passing through library args.
-        super().__init__(**kwargs)
-        # Motor handler for left-stick mecanum driving.
-        self._motor = MotorControl(board)
+class MecanumPS4Controller(QuitControl):
+    def __init__(self, board, interface="/dev/input/js0", connecting_using_ds4drv=True):
         # Enable Options+Share quit combo handling.
         QuitControl.__init__(self)
+        # Motor handler for left-stick mecanum driving.
+        self._motor = MotorControl(board)
+        motor = self._motor
+        l2_axis, r2_axis = TRIGGER_AXES[bool(connecting_using_ds4drv)]
+        # Dispatch table from (event type, number) straight to motor updates.
+        handlers = {
+            (JS_EVENT_AXIS, LEFT_STICK_X_AXIS): lambda value: motor.set_stick(x=value),
+            (JS_EVENT_AXIS, LEFT_STICK_Y_AXIS): lambda value: motor.set_stick(y=value),
+            (JS_EVENT_AXIS, l2_axis): lambda value: motor.set_trigger(l2=value),
+            (JS_EVENT_AXIS, r2_axis): lambda value: motor.set_trigger(r2=value),
+            (JS_EVENT_BUTTON, OPTIONS_BUTTON): self._on_options,
+            (JS_EVENT_BUTTON, SHARE_BUTTON): self._on_share,
+        }
+        self._reader = JsReader(interface, handlers)
+
+    def listen(self, timeout=30):
+        # Block reading controller events until disconnect or quit combo.
+        self._reader.listen(timeout=timeout)
 
     def stop_motors(self):
         # Stop motors on command or when exiting.
         self._motor.stop()
 
-    def on_L3_up(self, value):
-        # Forward stick motion.
-        self._motor.set_stick(y=value)
-
-    def on_L3_down(self, value):
-        # Backward stick motion.
-        self._motor.set_stick(y=value)
-
-    def on_L3_left(self, value):
-        # Left strafe.
-        self._motor.set_stick(x=value)
-
-    def on_L3_right(self, value):
-        # Right strafe.
-        self._motor.set_stick(x=value)
-
-    def on_L3_at_rest(self):
-        # Stop motion when the stick centers.
-        self._motor.set_stick(x=0, y=0)
-
-    def on_L3_x_at_rest(self):
-        # Clear strafe only.
-        self._motor.set_stick(x=0)
-
-    def on_L3_y_at_rest(self):
-        # Clear forward/back only.
-        self._motor.set_stick(y=0)
-
-    def on_L2_press(self, value):
-        # Rotate left with L2 (ignore negative values).
-        self._motor.set_trigger(l2=value)
-
-    def on_L2_release(self):
-        self._motor.set_trigger(l2=0)
-
-    def on_L2_at_rest(self):
-        self._motor.set_trigger(l2=0)
-
-    def on_R2_press(self, value):
-        # Rotate right with R2 (ignore negative values).
-        self._motor.set_trigger(r2=value)
-
-    def on_R2_release(self):
-        self._motor.set_trigger(r2=0)
+    def _on_options(self, value):
+        if value:
+            self.on_options_press()
+        else:
+            self.on_options_release()
 
-    def on_R2_at_rest(self):
-        self._motor.set_trigger(r2=0)
+    def _on_share(self, value):
+        if value:
+            self.on_share_press()
+        else:
+            self.on_share_release()
 
     def on_options_press(self):
         # Safety stop and check quit combo.